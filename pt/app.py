@@ -1,184 +1,729 @@
 import requests
-from bs4 import BeautifulSoup
-from flask import Flask, request, Response, make_response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree
+from flask import (
+    Flask,
+    request,
+    Response,
+    jsonify,
+    make_response,
+)
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
+import orjson
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import atexit
+import json
 import logging
+import os
 import re
+import string
 import html
+from functools import lru_cache
+from itertools import chain, islice
+from operator import itemgetter
+import threading
 import time
 
 # --- Logging Setup ---
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+# Per-request lines are DEBUG; PT_LOG_LEVEL=DEBUG brings them back when tracing
+logging.basicConfig(
+    level=os.environ.get("PT_LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s: %(message)s",
+)
 logger = logging.getLogger(__name__)
 
+
 # --- Initialize Flask App ---
+class OrjsonProvider(JSONProvider):
+    """
+    jsonify() through orjson; the base class builds responses from dumps().
+    Unlike Flask's default provider, output is raw UTF-8 with no trailing newline.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        # json.dumps options (indent, default, ...) have no orjson equivalent
+        if kwargs:
+            return json.dumps(obj, **kwargs)
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = "a-very-good-secret-key-is-needed"  # Replace!
+# Widget pages poll every few seconds; let browsers keep the stylesheet for a day
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 86400
+STYLESHEET_URL = f"{app.static_url_path}/widget.css"
+# Compress widget pages, the static shell and JSON for clients that accept it
+app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+app.config["COMPRESS_MIMETYPES"] = [
+    "text/html",
+    "text/css",
+    "application/javascript",
+    "application/json",
+]
+app.config["COMPRESS_LEVEL"] = 6
+app.config["COMPRESS_MIN_SIZE"] = 256
+Compress(app)
 
 # --- Constants ---
 BASE_URL = "https://scoring.paragleiter.org/"
+# Fail fast when the upstream is unreachable; read timeouts are set per fetch
+CONNECT_TIMEOUT = 3
+# Competition list is reloaded in the background this often (seconds)
+COMPETITIONS_REFRESH_INTERVAL = 3600
 # Cache active task result for a minute
 AUTO_SEARCH_CACHE_DURATION = 60
+# Background re-search and results refresh, ahead of both cache TTLs
+ACTIVE_TASK_REFRESH_INTERVAL = 20
+# The background loop stops after this long without a widget request; between
+# tasks it runs only once per AUTO_SEARCH_CACHE_DURATION
+ACTIVE_TASK_IDLE_TIMEOUT = 3 * ACTIVE_TASK_REFRESH_INTERVAL
 MAX_TASKS_TO_CHECK = 15
+# Recently active competitions probed ahead of the full scan
+RECENT_ACTIVE_COMPETITIONS = 4
+# Browsers/CDNs may reuse a rank page briefly; upstream results are cached 60s anyway
+RANK_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=60"
+# Idle between tasks: the answer only changes once the next search runs
+NO_ACTIVE_TASK_CACHE_CONTROL = f"public, max-age={AUTO_SEARCH_CACHE_DURATION}"
+# The /widget shell only changes on deploy; its data comes from /rank.json
+WIDGET_SHELL_MAX_AGE = 86400
+# Upper bound on pilot IDs resolved by one /get_ranks request
+MAX_PILOT_IDS_PER_REQUEST = 50
+# Competitions probed concurrently while searching for the active task
+ACTIVE_TASK_PROBE_WORKERS = 8
+# Parsed task results are reused across pilots for this long (seconds)
+TASK_RESULTS_CACHE_DURATION = 60
+# Failed fetches are remembered briefly so a 404 is not re-requested every poll
+TASK_RESULTS_ERROR_CACHE_DURATION = 5
+TASK_RESULTS_CACHE_MAX_ENTRIES = 256
+# Competition links on the index page are bare relative slugs (4+ chars)
+SLUG_RE = re.compile(r"^(?!http)[a-z0-9\-]{4,}/?$")
+# The filter runs during the XPath evaluation (lxml backs EXSLT re:test with
+# Python's re, once per <a>), so only matching anchors come back as elements
+COMPETITION_LINKS_XPATH = etree.XPath(
+    f"//a[re:test(@href, '{SLUG_RE.pattern}')]",
+    namespaces={"re": "http://exslt.org/regular-expressions"},
+)
+# Task pages are fed to the parser in chunks of this size as they download
+PARSE_CHUNK_SIZE = 64 * 1024
+# Upstream bodies past this size are cut off rather than buffered or parsed
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+CHARSET_RE = re.compile(r"charset=([\w-]+)", re.IGNORECASE)
+# <meta charset="..."> or <meta http-equiv=... content="...; charset=...">
+META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w-]+)", re.IGNORECASE)
+# The scoring site serves UTF-8; with no charset declared anywhere libxml2
+# would otherwise guess Latin-1
+DEFAULT_PAGE_ENCODING = "utf-8"
+# Pilot rows (no header cells, at least rank/id/name) and their cell text
+RESULT_ROWS_XPATH = etree.XPath(".//tr[not(th) and count(td) >= 3]")
+# Plain str results: smart strings would keep the whole parsed page alive in the cache
+CELL_TEXT_XPATH = etree.XPath("normalize-space(td[$n])", smart_strings=False)
+# Task status lives in the page's <h2>; scan for it without building a tree
+H2_RE = re.compile(rb"<h2[^>]*>(.*?)</h2>", re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(rb"<[^>]+>")
+IN_PROGRESS_RE = re.compile(rb"Task (\d+)\b.*IN PROGRESS")
+
+# --- HTTP Session ---
+# One pooled session so repeated fetches reuse the keep-alive connection,
+# and transient gateway errors get a quick retry instead of an error page.
+# Only those statuses are retried: a connect or read timeout fails at once,
+# so each fetch stays within its own timeout budget.
+# raise_on_status=False hands the last 5xx back so callers report its status.
+UPSTREAM_RETRY = Retry(
+    total=2,
+    connect=0,
+    read=False,
+    backoff_factor=0.2,
+    status_forcelist=[502, 503, 504],
+    raise_on_status=False,
+)
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=UPSTREAM_RETRY),
+)
+SESSION.headers.update({"User-Agent": "pt-rank-widget/1.0"})
+# Close pooled keep-alive sockets when the worker exits
+atexit.register(SESSION.close)
+
+# Shared by all searches; probes are I/O-bound and the Session is thread-safe
+PROBE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=ACTIVE_TASK_PROBE_WORKERS, thread_name_prefix="task-probe"
+)
 
 # --- Caches ---
 competitions_cache = None
+competitions_by_slug = {}
+competitions_lock = threading.Lock()
+# Replaced whole on every search, so lock-free readers see a consistent pair
 active_task_cache = {"data": None, "timestamp": 0}
+active_task_lock = threading.Lock()
+active_task_refresh_started = False
+active_task_refresh_lock = threading.Lock()
+# When a caller other than the background refresher last asked for the task
+last_active_task_request = 0.0
+# Competitions most recently seen IN PROGRESS, newest first
+recent_active_slugs = deque(maxlen=RECENT_ACTIVE_COMPETITIONS)
+recent_active_lock = threading.Lock()
+# (competition_slug, task_number) ->
+#     {"data": results or "ERROR: ...", "validators": {...}, "expires": ...}
+task_results_cache = {}
+task_results_lock = threading.Lock()
+# (competition_slug, task_number) -> Future of the fetch currently running
+task_results_inflight = {}
+# Task URL -> {"validators": {...}, "in_progress": bool} from the last 200 probe
+task_probe_cache = {}
 
 
 # --- Helper Functions ---
-def fetch_competitions():
-    global competitions_cache
-    if competitions_cache is not None:
-        return competitions_cache
+class PageTooLargeError(Exception):
+    """An upstream body went past MAX_PAGE_BYTES and was not read to the end."""
+
+
+def is_task_in_progress(page: bytes, task_num: int) -> bool:
+    """Checks the raw task page for an `<h2>` reading "Task N ... IN PROGRESS"."""
+    # Finished tasks make up most probes; rule them out with one substring scan
+    if b"IN PROGRESS" not in page:
+        return False
+    for match in H2_RE.finditer(page):
+        h2_text = b" ".join(TAG_RE.sub(b" ", match.group(1)).split())
+        in_progress = IN_PROGRESS_RE.search(h2_text)
+        if in_progress and int(in_progress.group(1)) == task_num:
+            return True
+    return False
+
+
+def load_competitions():
+    """Fetches and parses the competition list. Returns None on failure."""
     logger.info(f"Fetching competition list from {BASE_URL}")
-    competitions = []
+    competitions_by_href = {}
     try:
-        response = requests.get(BASE_URL, timeout=10)
+        response = SESSION.get(BASE_URL, timeout=(CONNECT_TIMEOUT, 10))
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        potential_links = soup.find_all("a", href=re.compile(r"^[a-z0-9\-]+/?$"))
-        found_slugs = set()
-        for link in potential_links:
+        tree = etree.HTML(
+            response.content,
+            etree.HTMLParser(
+                encoding=response_encoding(response) or sniff_encoding(response.content)
+            ),
+        )
+        # SLUG_RE already guarantees a relative slug of at least four chars
+        for link in COMPETITION_LINKS_XPATH(tree):
             href = link.get("href").strip("/")
-            name = link.get_text(strip=True)
-            if (
-                href
-                and name
-                and href not in found_slugs
-                and not href.startswith("http")
-                and len(href) > 3
-            ):
-                formatted_name = " ".join(
-                    word.capitalize() for word in name.replace("-", " ").split()
-                )
+            name = "".join(link.itertext()).strip()
+            if name and href not in competitions_by_href:
+                formatted_name = string.capwords(name.replace("-", " "))
                 if len(formatted_name) < 4:
                     formatted_name = name if len(name) > 3 else href.capitalize()
-                competitions.append({"slug": href, "name": formatted_name})
-                found_slugs.add(href)
-        competitions.sort(key=lambda x: x["name"])
+                competitions_by_href[href] = {"slug": href, "name": formatted_name}
+        competitions = sorted(competitions_by_href.values(), key=itemgetter("name"))
         if competitions:
             logger.info(f"Fetched {len(competitions)} competitions.")
-            competitions_cache = competitions
         else:
             logger.warning("Could not find competition links.")
-            competitions_cache = []
-        return competitions_cache
+        return competitions
     except Exception as e:
         logger.error(f"Error fetching/parsing competition list: {e}", exc_info=True)
-        return []
+        return None
+
+
+def publish_competitions(competitions: list[dict]):
+    """Swaps in a new competition list together with its slug -> name index."""
+    global competitions_cache, competitions_by_slug
+    competitions_by_slug = {comp["slug"]: comp["name"] for comp in competitions}
+    competitions_cache = competitions
+
+
+def schedule_competitions_refresh():
+    timer = threading.Timer(COMPETITIONS_REFRESH_INTERVAL, refresh_competitions)
+    timer.daemon = True
+    timer.start()
+
+
+def refresh_competitions():
+    """
+    Background reload of the competition list (stale-while-revalidate).
+    If the upstream is unreachable, the previous list keeps being served.
+    """
+    competitions = load_competitions()
+    if competitions is not None:
+        publish_competitions(competitions)
+    schedule_competitions_refresh()
+
+
+def fetch_competitions():
+    if competitions_cache is not None:
+        return competitions_cache
+    # Double-checked: concurrent cold requests share a single upstream fetch
+    with competitions_lock:
+        if competitions_cache is not None:
+            return competitions_cache
+        competitions = load_competitions()
+        if competitions is None:
+            return []
+        publish_competitions(competitions)
+        schedule_competitions_refresh()
+        return competitions_cache
+
+
+def response_encoding(response: requests.Response) -> str | None:
+    """Charset named by the Content-Type header, if any."""
+    charset = CHARSET_RE.search(response.headers.get("Content-Type", ""))
+    return charset.group(1) if charset else None
+
+
+def sniff_encoding(head: bytes) -> str:
+    """
+    Charset declared by a <meta> within the first PARSE_CHUNK_SIZE bytes of
+    a page, else DEFAULT_PAGE_ENCODING.
+    """
+    charset = META_CHARSET_RE.search(head, 0, PARSE_CHUNK_SIZE)
+    return charset.group(1).decode("ascii") if charset else DEFAULT_PAGE_ENCODING
+
+
+def response_validators(response: requests.Response) -> dict:
+    """Conditional request headers that revalidate what `response` returned."""
+    validators = {}
+    if "ETag" in response.headers:
+        validators["If-None-Match"] = response.headers["ETag"]
+    if "Last-Modified" in response.headers:
+        validators["If-Modified-Since"] = response.headers["Last-Modified"]
+    return validators
+
+
+def iter_capped(response: requests.Response, url: str) -> Iterator[bytes]:
+    """
+    Yields a streamed body in PARSE_CHUNK_SIZE pieces. Raises PageTooLargeError
+    once more than MAX_PAGE_BYTES have arrived, so a cut-off page is never
+    mistaken for a complete one; its connection is dropped, not pooled.
+    """
+    received = 0
+    for chunk in response.iter_content(chunk_size=PARSE_CHUNK_SIZE):
+        received += len(chunk)
+        if received > MAX_PAGE_BYTES:
+            raise PageTooLargeError(f"{url} is larger than {MAX_PAGE_BYTES} bytes")
+        yield chunk
+
+
+def drain_response(response: requests.Response, url: str):
+    """
+    Reads what is left of a streamed body (within MAX_PAGE_BYTES); closing
+    it unread would drop the keep-alive connection instead of pooling it.
+    """
+    try:
+        for _ in iter_capped(response, url):
+            pass
+    except PageTooLargeError as e:
+        logger.warning(f"Not draining oversized body: {e}")
+
+
+def task_url(comp_slug: str, task_num: int | str) -> str:
+    """URL of one task page, shared by the probes and the results fetch."""
+    return f"{BASE_URL}{comp_slug}/task{task_num}.html"
+
+
+def find_in_progress_task(
+    comp_slug: str, stop: threading.Event | None = None
+) -> str | None:
+    """
+    Walks task1.html, task2.html, ... of one competition until a 404.
+    Returns the number of the task marked IN PROGRESS, if any.
+    Pages seen before are revalidated, so unchanged ones come back as 304;
+    unseen ones get a HEAD first, so the closing 404 carries no body.
+    Gives up early once `stop` is set because an earlier-listed competition
+    already has a task in progress.
+    """
+    logger.debug(f"Checking competition: {comp_slug}")
+    for task_num in range(1, MAX_TASKS_TO_CHECK + 1):
+        if stop is not None and stop.is_set():
+            return None
+        url = task_url(comp_slug, task_num)
+        probe = task_probe_cache.get(url)
+        try:
+            # A never-seen URL is usually the 404 past the last task: headers only
+            if probe is None:
+                head = SESSION.head(url, timeout=(CONNECT_TIMEOUT, 3))
+                if head.status_code == 404:
+                    logger.debug(f"Task {task_num} not found for {comp_slug}.")
+                    break
+            with SESSION.get(
+                url,
+                timeout=(CONNECT_TIMEOUT, 5),
+                headers=probe["validators"] if probe else None,
+                stream=True,
+            ) as response:
+                if response.status_code == 404:
+                    logger.debug(f"Task {task_num} not found for {comp_slug}.")
+                    drain_response(response, url)
+                    task_probe_cache.pop(url, None)
+                    break
+                if probe and response.status_code == 304:
+                    drain_response(response, url)
+                    in_progress = probe["in_progress"]
+                else:
+                    response.raise_for_status()
+                    page = b"".join(iter_capped(response, url))
+                    in_progress = is_task_in_progress(page, task_num)
+                    # Stored even without validators: the URL is known to
+                    # exist, so later passes skip the HEAD
+                    task_probe_cache[url] = {
+                        "validators": response_validators(response),
+                        "in_progress": in_progress,
+                    }
+            if in_progress:
+                return str(task_num)
+        except requests.exceptions.Timeout:
+            logger.warning(f"Timeout checking {url}")
+        except requests.exceptions.RequestException as e:
+            if e.response is None or e.response.status_code != 404:
+                logger.warning(f"Error checking {url}: {e}")
+        except Exception as e:
+            logger.error(f"Error parsing {url}: {e}", exc_info=False)
+    return None
 
 
 # find_active_task (with debug mode)
-def find_active_task(debug_mode=False):
+def find_active_task(debug_mode=False, force=False):
     """
     Finds the currently active task.
     If debug_mode is True, returns a hardcoded test task.
+    If force is True, searches even while the cached answer is fresh.
     """
+    global last_active_task_request
     if debug_mode:
         logger.info("DEBUG MODE: Simulating active task.")
         return {"competition_slug": "alpenrosen-cup-2025", "task_number": "2"}
 
-    global active_task_cache
-    now = time.time()
-    if active_task_cache["data"] and (
-        now - active_task_cache["timestamp"] < AUTO_SEARCH_CACHE_DURATION
-    ):
-        logger.info("Returning cached active task.")
-        return active_task_cache["data"]
+    if not force:
+        last_active_task_request = time.time()
+        start_active_task_refresh()
+    cached = active_task_cache
+    if not force and time.time() - cached["timestamp"] < AUTO_SEARCH_CACHE_DURATION:
+        logger.debug("Returning cached active task.")
+        return cached["data"]
+    # Double-checked: requests arriving mid-search reuse its answer
+    with active_task_lock:
+        cached = active_task_cache
+        now = time.time()
+        if not force and now - cached["timestamp"] < AUTO_SEARCH_CACHE_DURATION:
+            return cached["data"]
+        return search_active_task(now)
+
+
+def search_active_task(now: float) -> dict | None:
+    """
+    Probes the competitions for an in-progress task and caches the answer.
+    The earliest competition in list order wins, as with a serial scan, so
+    every worker settles on the same one however the probes are timed.
+    """
     logger.info("Searching for active task...")
     competitions = fetch_competitions()
     if not competitions:
         logger.warning("Cannot search for active task: Competition list is empty.")
         return None
-    for comp in competitions:
-        comp_slug = comp["slug"]
-        logger.debug(f"Checking competition: {comp_slug}")
-        for task_num in range(1, MAX_TASKS_TO_CHECK + 1):
-            task_url = f"{BASE_URL}{comp_slug}/task{task_num}.html"
-            try:
-                response = requests.get(task_url, timeout=5)
-                if response.status_code == 404:
-                    logger.debug(f"Task {task_num} not found for {comp_slug}.")
-                    break
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, "html.parser")
-                h2_tags = soup.find_all("h2")
-                for h2 in h2_tags:
-                    h2_text = h2.get_text(" ", strip=True)
-                    if f"Task {task_num}" in h2_text and "IN PROGRESS" in h2_text:
-                        logger.info(
-                            f"Found active task: Comp='{comp_slug}', Task='{task_num}'"
-                        )
-                        active_task_info = {
-                            "competition_slug": comp_slug,
-                            "task_number": str(task_num),
-                        }
-                        active_task_cache["data"] = active_task_info
-                        active_task_cache["timestamp"] = now
-                        return active_task_info
-            except requests.exceptions.Timeout:
-                logger.warning(f"Timeout checking {task_url}")
-            except requests.exceptions.RequestException as e:
-                if e.response is None or e.response.status_code != 404:
-                    logger.warning(f"Error checking {task_url}: {e}")
-            except Exception as e:
-                logger.error(f"Error parsing {task_url}: {e}", exc_info=False)
+    order = {comp["slug"]: index for index, comp in enumerate(competitions)}
+    # During an event the active competition rarely changes; queue it first
+    recent_slugs = [
+        comp_slug for comp_slug in recent_active_slugs if comp_slug in order
+    ]
+    slugs = recent_slugs + [
+        comp["slug"] for comp in competitions if comp["slug"] not in recent_slugs
+    ]
+    # One stop flag per competition, so a hit only halts the later-listed ones
+    stops = {comp_slug: threading.Event() for comp_slug in slugs}
+    futures = {}
+    for comp_slug in slugs:
+        probe = PROBE_EXECUTOR.submit(
+            find_in_progress_task, comp_slug, stops[comp_slug]
+        )
+        futures[probe] = comp_slug
+    best = None
+    try:
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            task_num = future.result()
+            comp_slug = futures[future]
+            if not task_num or (best and order[comp_slug] > order[best[0]]):
+                continue
+            best = (comp_slug, task_num)
+            # Competitions listed after a hit can no longer win: stop them,
+            # but let the earlier ones finish
+            for other, other_slug in futures.items():
+                if order[other_slug] > order[comp_slug]:
+                    stops[other_slug].set()
+                    other.cancel()
+    finally:
+        for future, comp_slug in futures.items():
+            stops[comp_slug].set()
+            future.cancel()
+    if best:
+        return publish_active_task(*best, now)
     logger.info("No active task found after checking.")
-    active_task_cache["data"] = None
-    active_task_cache["timestamp"] = now
+    publish_active_task_cache(None, now)
     return None
 
 
-# fetch_and_parse_task_results (no changes)
-# ... (Keep the exact function from previous versions) ...
-def fetch_and_parse_task_results(competition_slug: str, task_number: str):
-    url = f"{BASE_URL}{competition_slug}/task{task_number}.html"
+def publish_active_task_cache(active_task_info: dict | None, now: float):
+    """Swaps in a new answer; readers see the old or new pair, never a mix."""
+    global active_task_cache
+    active_task_cache = {"data": active_task_info, "timestamp": now}
+
+
+def publish_active_task(comp_slug: str, task_num: str, now: float) -> dict:
+    """Caches a found active task and moves its competition to the MRU front."""
+    logger.info(f"Found active task: Comp='{comp_slug}', Task='{task_num}'")
+    active_task_info = {"competition_slug": comp_slug, "task_number": task_num}
+    publish_active_task_cache(active_task_info, now)
+    with recent_active_lock:
+        if comp_slug in recent_active_slugs:
+            recent_active_slugs.remove(comp_slug)
+        recent_active_slugs.appendleft(comp_slug)
+    return active_task_info
+
+
+def schedule_active_task_refresh(interval: float = ACTIVE_TASK_REFRESH_INTERVAL):
+    timer = threading.Timer(interval, refresh_active_task)
+    timer.daemon = True
+    timer.start()
+
+
+def refresh_active_task():
+    """
+    Background re-search and results refresh, so widget requests keep
+    finding warm caches instead of waiting on upstream probes.
+    Between tasks it re-searches only once per AUTO_SEARCH_CACHE_DURATION.
+    Once nobody has polled for ACTIVE_TASK_IDLE_TIMEOUT it stops; the next
+    widget request starts it again.
+    """
+    global active_task_refresh_started
+    with active_task_refresh_lock:
+        if time.time() - last_active_task_request > ACTIVE_TASK_IDLE_TIMEOUT:
+            logger.info("No widget requests lately; stopping background refresh.")
+            active_task_refresh_started = False
+            return
+    interval = AUTO_SEARCH_CACHE_DURATION
+    try:
+        active_task_info = find_active_task(force=True)
+        if active_task_info:
+            fetch_and_parse_task_results(
+                active_task_info["competition_slug"],
+                active_task_info["task_number"],
+                force=True,
+            )
+            interval = ACTIVE_TASK_REFRESH_INTERVAL
+    except Exception as e:
+        logger.error(f"Background active-task refresh failed: {e}")
+    schedule_active_task_refresh(interval)
+
+
+def start_active_task_refresh():
+    """Starts the background refresher unless it is already running."""
+    global active_task_refresh_started
+    if active_task_refresh_started:
+        return
+    with active_task_refresh_lock:
+        if active_task_refresh_started:
+            return
+        active_task_refresh_started = True
+    schedule_active_task_refresh()
+
+
+def store_task_results(
+    cache_key: tuple[str, str], data, validators: dict[str, str], now: float
+):
+    """Stores results (or an error), evicting expired then oldest entries when full."""
+    ttl = (
+        TASK_RESULTS_ERROR_CACHE_DURATION
+        if isinstance(data, str)
+        else TASK_RESULTS_CACHE_DURATION
+    )
+    with task_results_lock:
+        if len(task_results_cache) >= TASK_RESULTS_CACHE_MAX_ENTRIES:
+            for key, entry in list(task_results_cache.items()):
+                if now >= entry["expires"]:
+                    del task_results_cache[key]
+        if len(task_results_cache) >= TASK_RESULTS_CACHE_MAX_ENTRIES:
+            oldest = min(
+                task_results_cache, key=lambda k: task_results_cache[k]["expires"]
+            )
+            del task_results_cache[oldest]
+        task_results_cache[cache_key] = {
+            "data": data,
+            "validators": validators,
+            "expires": now + ttl,
+        }
+
+
+def fetch_and_parse_task_results(
+    competition_slug: str, task_number: str, force: bool = False
+):
+    """
+    Returns the parsed results of a task (or an "ERROR: ..." string),
+    served from task_results_cache while fresh unless force is True.
+    """
+    cache_key = (competition_slug, task_number)
+    now = time.time()
+    # Entries are replaced whole, never mutated, so reads need no lock
+    cached = task_results_cache.get(cache_key)
+    if not force and cached and now < cached["expires"]:
+        logger.debug(
+            f"Returning cached results for {competition_slug}/Task {task_number}."
+        )
+        return cached["data"]
+    # Single-flight: concurrent misses for one task share the leader's fetch
+    with task_results_lock:
+        # A leader may have stored its result since the lock-free read
+        cached = task_results_cache.get(cache_key)
+        if not force and cached and now < cached["expires"]:
+            return cached["data"]
+        inflight = task_results_inflight.get(cache_key)
+        if inflight is None:
+            task_results_inflight[cache_key] = future = Future()
+    if inflight is not None:
+        return inflight.result()
+    try:
+        results_data, validators = load_task_results(
+            competition_slug, task_number, cached
+        )
+        previous_good = cached and not isinstance(cached["data"], str)
+        if force and previous_good and isinstance(results_data, str):
+            # A failed refresh keeps the last good results until they expire
+            logger.warning(
+                f"Keeping cached results after refresh failed: {results_data}"
+            )
+            results_data = cached["data"]
+        else:
+            store_task_results(cache_key, results_data, validators, now)
+        future.set_result(results_data)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with task_results_lock:
+            del task_results_inflight[cache_key]
+    return results_data
+
+
+def load_task_results(
+    competition_slug: str, task_number: str, previous: dict | None = None
+):
+    """
+    Fetches and parses one task page. If `previous` (an expired cache entry)
+    holds parsed results, the request is conditional and a 304 reuses them.
+    Returns (results or "ERROR: ...", validators for the next request).
+    """
+    url = task_url(competition_slug, task_number)
+    headers = {}
+    if previous and not isinstance(previous["data"], str):
+        headers = previous["validators"]
     logger.info(f"Fetching task results from: {url}")
     try:
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
+        # Streamed, so the page is parsed as it arrives instead of buffered whole
+        with SESSION.get(
+            url, timeout=(CONNECT_TIMEOUT, 15), headers=headers, stream=True
+        ) as response:
+            if headers and response.status_code == 304:
+                logger.info(f"Task results unchanged (304) for {url}")
+                drain_response(response, url)
+                return previous["data"], previous["validators"]
+            response.raise_for_status()
+            logger.debug(
+                f"Task results for {url} sent with Content-Encoding: "
+                f"{response.headers.get('Content-Encoding', 'identity')}"
+            )
+            chunks = iter_capped(response, url)
+            results = parse_task_results(chunks, url, response_encoding(response))
+            # Errors are never revalidated, so a 304 cannot pin a bad parse
+            if isinstance(results, str):
+                return results, {}
+            return results, response_validators(response)
+    except PageTooLargeError as e:
+        logger.error(f"Task results page too large: {e}")
+        return "ERROR: Task page too large to process.", {}
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching task results URL {url}: {e}")
         status_code = (
-            f" (Status: {e.response.status_code})"
-            if hasattr(e, "response") and e.response
-            else ""
+            f" (Status: {e.response.status_code})" if e.response is not None else ""
         )
         error_msg = f"Could not fetch data{status_code}."
-        if hasattr(e, "response") and e.response and e.response.status_code == 404:
+        # An error Response is falsy, so compare against None explicitly
+        if e.response is not None and e.response.status_code == 404:
             error_msg = f"Task {task_number} page not found for competition '{competition_slug}' (404)."
-        return f"ERROR: {error_msg}"
+        return f"ERROR: {error_msg}", {}
+
+
+def iter_closed_tables(chunks: Iterable[bytes], encoding: str | None = None):
+    """
+    Pull-parses a page as its chunks arrive, yielding each <table> once closed.
+    A table is cleared once the consumer asks for the next one, so skipped
+    tables do not keep their rows in memory while the page downloads.
+    Without an `encoding` the first chunk's <meta> charset is used.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    parser = etree.HTMLPullParser(
+        events=("end",), tag="table", encoding=encoding or sniff_encoding(first)
+    )
+    for chunk in chain((first,), chunks):
+        parser.feed(chunk)
+        for _, table in parser.read_events():
+            yield table
+            table.clear(keep_tail=True)
+    parser.close()
+    for _, table in parser.read_events():
+        yield table
+        table.clear(keep_tail=True)
+
+
+def parse_task_results(chunks: Iterable[bytes], url: str, encoding: str | None = None):
+    """
+    Extracts rank/id/name rows from the second result table of a task page.
+    The page is pull-parsed chunk by chunk and parsing stops once that table
+    has closed. Without an `encoding` (from the Content-Type header) the
+    page's own <meta> charset applies, then DEFAULT_PAGE_ENCODING.
+    Returns the rows indexed by pilot id (in table order) for O(1) lookups.
+    """
     try:
-        soup = BeautifulSoup(response.text, "html.parser")
-        all_result_tables = soup.find_all("table", class_="result")
-        if len(all_result_tables) < 2:
+        result_tables = (
+            table
+            for table in iter_closed_tables(chunks, encoding)
+            if "result" in (table.get("class") or "").split()
+        )
+        results_table = next(islice(result_tables, 1, None), None)
+        # Drain the rest unparsed so the keep-alive connection can be reused
+        for _ in chunks:
+            pass
+        if results_table is None:
             return (
                 "ERROR: Results table structure not found or not as expected on page."
             )
-        results_table = all_result_tables[1]
-        rows = results_table.find_all("tr")
-        parsed_results = []
-        for i, row in enumerate(rows):
-            if row.find("th"):
-                continue
-            cells = row.find_all("td")
-            if len(cells) > 2:
-                try:
-                    rank = cells[0].get_text(strip=True)
-                    pilot_id = cells[1].get_text(strip=True)
-                    pilot_name = cells[2].get_text(strip=True)
-                    if rank and pilot_id and pilot_name:
-                        parsed_results.append(
-                            {"rank": rank, "id": pilot_id, "name": pilot_name}
-                        )
-                except Exception:
-                    pass
+        parsed_results = {}
+        for row in RESULT_ROWS_XPATH(results_table):
+            rank = CELL_TEXT_XPATH(row, n=1)
+            pilot_id = CELL_TEXT_XPATH(row, n=2)
+            pilot_name = CELL_TEXT_XPATH(row, n=3)
+            if rank and pilot_id and pilot_name:
+                # Keep the first row should an id ever appear twice
+                parsed_results.setdefault(
+                    pilot_id, {"rank": rank, "id": pilot_id, "name": pilot_name}
+                )
         if not parsed_results:
             return "ERROR: No pilot data found in the results table."
         logger.info(
             f"Successfully parsed {len(parsed_results)} pilot entries from {url}"
         )
         return parsed_results
+    except PageTooLargeError:
+        raise
     except Exception as e:
         logger.error(
             f"Error parsing HTML or processing tables for {url}: {e}", exc_info=True
@@ -187,17 +732,48 @@ def fetch_and_parse_task_results(competition_slug: str, task_number: str):
 
 
 # --- REVISED: HTML Page Generator for Widget ---
+# Colour by rank: index 0 unranked, 1 winner, 2..49 top field, last entry 50 and below
+RANK_COLORS = ("black", "gold") + ("limegreen",) * 48 + ("red",)
+LAST_RANK_COLOR_INDEX = len(RANK_COLORS) - 1
+
+# Rendered pages kept by generate_html_page's LRU
+RENDERED_PAGE_CACHE_SIZE = 512
+# Static document skeleton, built once; only the title and body vary.
+# Styles live in static/widget.css so browsers cache them across polls.
+PAGE_TEMPLATE = (
+    '<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8">'
+    '<meta name="viewport" content="width=device-width, initial-scale=1.0">'
+    "<title>{title}</title>"
+    f'<link rel="stylesheet" href="{STYLESHEET_URL}"></head>'
+    "<body>{body}</body></html>"
+)
+# Bound once so each render is a single substitution pass over the skeleton
+render_page_template = PAGE_TEMPLATE.format
+
+
+def rank_color(rank: str) -> str:
+    """Display colour for a rank; non-numeric ranks (e.g. DNF) stay black."""
+    # Strings passing isdecimal() always parse with int(): no exception path
+    if not rank.isdecimal():
+        return "black"
+    return RANK_COLORS[min(int(rank), LAST_RANK_COLOR_INDEX)]
+
+
+# Pure function of its arguments, and polls keep asking for the same few pages
+@lru_cache(maxsize=RENDERED_PAGE_CACHE_SIZE)
 def generate_html_page(
     rank: str | None = None,
     error: str | None = None,
     competition_display_name: str | None = None,
     task_number: str | None = None,
-) -> str:
-    """Generates the HTML page for the widget, optimized for a small viewport."""
+) -> bytes:
+    """
+    Generates the HTML page for the widget, optimized for a small viewport.
+    Returned pre-encoded so Response does not re-encode it per request.
+    """
     content = ""
     title = "Pilot Rank"
     context_html = ""
-    rank_color = "black"
     if competition_display_name and task_number:
         comp_esc = html.escape(competition_display_name)
         task_esc = html.escape(task_number)
@@ -205,21 +781,13 @@ def generate_html_page(
         context_html = f'<div id="context-info">{comp_esc} - T{task_esc}</div>'
 
     if rank:
-        try:
-            rank_int = int(rank)
-            if rank_int == 1:
-                rank_color = "gold"
-            elif 2 <= rank_int <= 49:
-                rank_color = "limegreen"
-            elif rank_int >= 50:
-                rank_color = "red"
-        except (ValueError, TypeError):
-            rank_color = "black"
-        content = f'<div id="rank-display" style="color: {rank_color};">{html.escape(rank)}</div>'
+        rank_esc = html.escape(rank)
+        color = rank_color(rank)
+        content = f'<div id="rank-display" style="color: {color};">{rank_esc}</div>'
         if context_html:
-            title = f"Rank {html.escape(rank)} - {comp_esc} T{task_esc}"
+            title = f"Rank {rank_esc} - {comp_esc} T{task_esc}"
         else:
-            title = f"Rank: {html.escape(rank)}"
+            title = f"Rank: {rank_esc}"
     elif error:
         content = f'<div id="error-display">{html.escape(error)}</div>'
         title = "Error"
@@ -227,29 +795,61 @@ def generate_html_page(
         content = '<div id="error-display">No data</div>'
         title = "Error"
 
-    # Simplified CSS for a small widget, with readable fonts
-    html_structure = f"""<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0"><title>{title}</title>
-    <style>
-        html, body {{
-            height: 100%; width: 100%; margin: 0; padding: 0;
-            font-family: sans-serif; background-color: transparent;
-            position: relative; overflow: hidden;
-            display: flex; justify-content: center; align-items: center; text-align: center;
-        }}
-        #context-info {{
-            position: absolute; top: 5px; left: 50%; transform: translateX(-50%);
-            font-size: 10px; color: black; white-space: nowrap; z-index: 10;
-        }}
-        #rank-display {{
-            font-size: 45vh; font-weight: bold; line-height: 1;
-            text-shadow: 1px 1px 3px rgba(0, 0, 0, 0.5); z-index: 1;
-        }}
-        #error-display {{
-            font-size: 14px; color: black; font-weight: bold;
-            padding: 5px; width: 90%;
-        }}
-    </style></head><body>{context_html}{content}</body></html>"""
-    return html_structure
+    return render_page_template(title=title, body=context_html + content).encode()
+
+
+# Pages that never vary (bare landing hit, idle between tasks) are rendered once
+MISSING_PILOT_ID_MSG = "Pilot ID missing. Use ?pilot_id=... in URL."
+MISSING_PILOT_ID_PAGE = generate_html_page(error=MISSING_PILOT_ID_MSG)
+NO_ACTIVE_TASK_MSG = "No active task found."
+NO_ACTIVE_TASK_PAGE = generate_html_page(error=NO_ACTIVE_TASK_MSG)
+RESULTS_ERROR_MSG = "Error loading task data."
+# Malformed requests stay malformed; lookup failures must not be cached
+BAD_REQUEST_CACHE_CONTROL = "public, max-age=60"
+ERROR_CACHE_CONTROL = "no-store"
+
+
+# --- Route Helpers ---
+def html_response(page: bytes, status: int, cache_control: str) -> Response:
+    response = Response(page, mimetype="text/html", status=status)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def json_response(status: int, cache_control: str, **fields) -> Response:
+    response = jsonify(**fields)
+    response.status_code = status
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def conditional(response: Response) -> Response:
+    """
+    Tags a 200 with an ETag, so repeat polls with a matching If-None-Match
+    get an empty 304. Not for errors: preconditions only apply to 2xx.
+    """
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def lookup_active_results() -> tuple[dict | None, dict | None]:
+    """
+    The active task and its parsed results, shared by the rank routes.
+    Returns (None, None) when no task is in progress, and (task, None) when
+    its results could not be loaded; that failure is logged here.
+    """
+    active_task_info = find_active_task()
+    if not active_task_info:
+        logger.debug(NO_ACTIVE_TASK_MSG)
+        return None, None
+    comp_slug = active_task_info["competition_slug"]
+    task_num = active_task_info["task_number"]
+    logger.debug(f"Active task found: {comp_slug}/Task {task_num}. Fetching results...")
+    results_data = fetch_and_parse_task_results(comp_slug, task_num)
+    if isinstance(results_data, str):
+        logger.error(f"Failed to get results for active task: {results_data}")
+        return active_task_info, None
+    return active_task_info, results_data
 
 
 # --- Simplified Root Route for Widget ---
@@ -262,84 +862,163 @@ def get_rank_widget():
     pilot_id = request.args.get("pilot_id", "").strip()
 
     if not pilot_id:
-        error_msg = "Pilot ID missing. Use ?pilot_id=... in URL."
-        logger.warning(error_msg)
-        return Response(
-            generate_html_page(error=error_msg), mimetype="text/html", status=400
-        )
-
-    logger.info(f"Request for Pilot ID: {pilot_id}. Finding active task...")
-    active_task_info = find_active_task()
+        logger.warning(MISSING_PILOT_ID_MSG)
+        return html_response(MISSING_PILOT_ID_PAGE, 400, BAD_REQUEST_CACHE_CONTROL)
 
+    logger.debug(f"Request for Pilot ID: {pilot_id}. Finding active task...")
+    active_task_info, results_data = lookup_active_results()
     if not active_task_info:
-        error_msg = "No active task found."
-        logger.info(error_msg)
-        return Response(
-            generate_html_page(error=error_msg), mimetype="text/html", status=404
-        )
+        return html_response(NO_ACTIVE_TASK_PAGE, 404, NO_ACTIVE_TASK_CACHE_CONTROL)
 
     comp_slug = active_task_info["competition_slug"]
     task_num = active_task_info["task_number"]
-    logger.info(f"Active task found: {comp_slug}/Task {task_num}. Fetching results...")
-
     # Look up display name for context
-    competition_display_name = comp_slug
-    if competitions_cache:
-        for comp in competitions_cache:
-            if comp["slug"] == comp_slug:
-                competition_display_name = comp["name"]
-                break
-
-    results_data = fetch_and_parse_task_results(comp_slug, task_num)
-
-    if isinstance(results_data, str) and results_data.startswith("ERROR:"):
-        logger.error(f"Failed to get results for active task: {results_data}")
-        error_msg = "Error loading task data."
-        return Response(
-            generate_html_page(
-                error=error_msg,
-                competition_display_name=competition_display_name,
-                task_number=task_num,
-            ),
-            mimetype="text/html",
-            status=500,
-        )
+    context = {
+        "competition_display_name": competitions_by_slug.get(comp_slug, comp_slug),
+        "task_number": task_num,
+    }
+    if results_data is None:
+        page = generate_html_page(error=RESULTS_ERROR_MSG, **context)
+        return html_response(page, 500, ERROR_CACHE_CONTROL)
 
-    # Search for the pilot ID in the results
-    found_rank = None
-    for pilot in results_data:
-        if pilot["id"] == pilot_id:
-            found_rank = pilot["rank"]
-            break
+    # Results are indexed by pilot ID
+    pilot = results_data.get(pilot_id)
+    found_rank = pilot["rank"] if pilot else None
 
     if found_rank:
-        logger.info(
+        logger.debug(
             f"Pilot ID {pilot_id} found with rank {found_rank}. Displaying rank."
         )
-        html_content = generate_html_page(
-            rank=found_rank,
-            competition_display_name=competition_display_name,
-            task_number=task_num,
-        )
-        return Response(html_content, mimetype="text/html", status=200)
+        page = generate_html_page(rank=found_rank, **context)
+        return conditional(html_response(page, 200, RANK_CACHE_CONTROL))
     else:
         logger.warning(
             f"Pilot ID {pilot_id} not found in active task {comp_slug}/Task {task_num}."
         )
-        error_msg = f"Pilot ID {html.escape(pilot_id)} not found."
-        return Response(
-            generate_html_page(
-                error=error_msg,
-                competition_display_name=competition_display_name,
-                task_number=task_num,
-            ),
-            mimetype="text/html",
-            status=404,
+        # generate_html_page escapes everything it embeds; escape only there
+        page = generate_html_page(error=f"Pilot ID {pilot_id} not found.", **context)
+        return html_response(page, 404, ERROR_CACHE_CONTROL)
+
+
+# --- Batch Route for Dashboards ---
+@app.route("/get_ranks", methods=["GET"])
+def get_ranks():
+    """
+    Resolves several pilots in the active task with one results lookup,
+    so a dashboard of widgets does not issue one request per pilot.
+    Expects a comma-separated `pilot_ids` parameter. e.g., /get_ranks?pilot_ids=80227,80228
+    """
+    pilot_ids = [
+        pilot_id.strip()
+        for pilot_id in request.args.get("pilot_ids", "").split(",")
+        if pilot_id.strip()
+    ]
+    if not pilot_ids:
+        return json_response(
+            400,
+            BAD_REQUEST_CACHE_CONTROL,
+            error="Pilot IDs missing. Use ?pilot_ids=...,... in URL.",
+        )
+    if len(pilot_ids) > MAX_PILOT_IDS_PER_REQUEST:
+        return json_response(
+            400,
+            BAD_REQUEST_CACHE_CONTROL,
+            error=f"At most {MAX_PILOT_IDS_PER_REQUEST} pilot IDs per request.",
+        )
+
+    active_task_info, results_data = lookup_active_results()
+    if not active_task_info:
+        return json_response(
+            404, NO_ACTIVE_TASK_CACHE_CONTROL, error=NO_ACTIVE_TASK_MSG
+        )
+    if results_data is None:
+        return json_response(500, ERROR_CACHE_CONTROL, error=RESULTS_ERROR_MSG)
+
+    comp_slug = active_task_info["competition_slug"]
+    ranks = []
+    for pilot_id in pilot_ids:
+        pilot = results_data.get(pilot_id)
+        ranks.append({"id": pilot_id, "rank": pilot["rank"] if pilot else None})
+    response = json_response(
+        200,
+        RANK_CACHE_CONTROL,
+        competition=comp_slug,
+        competition_name=competitions_by_slug.get(comp_slug, comp_slug),
+        task=active_task_info["task_number"],
+        ranks=ranks,
+    )
+    return conditional(response)
+
+
+# --- Static Widget Shell and its JSON Feed ---
+# Rendered once: only the stylesheet link is filled in, from STYLESHEET_URL
+WIDGET_SHELL_PAGE = (
+    app.jinja_env.get_template("widget.html")
+    .render(stylesheet_url=STYLESHEET_URL)
+    .encode()
+)
+
+
+@app.route("/widget", methods=["GET"])
+def get_widget_shell():
+    """
+    Static page that polls /rank.json and updates itself in place.
+    Expects the same `pilot_id` query parameter. e.g., /widget?pilot_id=80227
+    """
+    # A buffered body, so Flask-Compress re-evaluates If-None-Match against
+    # the ETag it suffixes with the chosen encoding
+    return conditional(
+        html_response(WIDGET_SHELL_PAGE, 200, f"public, max-age={WIDGET_SHELL_MAX_AGE}")
+    )
+
+
+@app.route("/rank.json", methods=["GET"])
+def get_rank_json():
+    """
+    Rank of one pilot in the active task, for the /widget shell.
+    Expects a `pilot_id` query parameter. e.g., /rank.json?pilot_id=80227
+    """
+    pilot_id = request.args.get("pilot_id", "").strip()
+    if not pilot_id:
+        return json_response(400, BAD_REQUEST_CACHE_CONTROL, error=MISSING_PILOT_ID_MSG)
+
+    active_task_info, results_data = lookup_active_results()
+    if not active_task_info:
+        return json_response(
+            404, NO_ACTIVE_TASK_CACHE_CONTROL, error=NO_ACTIVE_TASK_MSG
         )
 
+    comp_slug = active_task_info["competition_slug"]
+    context = {
+        "comp": competitions_by_slug.get(comp_slug, comp_slug),
+        "task": active_task_info["task_number"],
+    }
+    if results_data is None:
+        return json_response(
+            500, ERROR_CACHE_CONTROL, error=RESULTS_ERROR_MSG, **context
+        )
+
+    pilot = results_data.get(pilot_id)
+    if not pilot:
+        return json_response(
+            404, ERROR_CACHE_CONTROL, error=f"Pilot ID {pilot_id} not found.", **context
+        )
+
+    response = json_response(
+        200,
+        RANK_CACHE_CONTROL,
+        rank=pilot["rank"],
+        color=rank_color(pilot["rank"]),
+        **context,
+    )
+    return conditional(response)
+
 
 # --- Main Execution ---
 if __name__ == "__main__":
     fetch_competitions()  # Pre-fetch competition list on startup
-    logger.info("Starting Flask application...")
-    app.run(host="0.0.0.0", port=5001, debug=True)  # Keep debug=True for testing
+    logger.info(
+        "Starting Flask development server; deploy with `gunicorn app:app` instead."
+    )
+    # Debugger and reloader stay off unless FLASK_DEBUG=1 is set
+    app.run(host="0.0.0.0", port=5001)
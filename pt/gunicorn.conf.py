@@ -0,0 +1,25 @@
+# Gunicorn settings for the rank widget (picked up from the working directory).
+import threading
+
+bind = "0.0.0.0:5001"
+# Threaded workers overlap the blocking upstream fetches. gevent is avoided on
+# purpose: the probe executor and refresh timers rely on real threads, and lxml
+# parsing would block every greenlet in the worker.
+worker_class = "gthread"
+workers = 2
+threads = 8
+# Embedded widgets poll every few seconds; keep their connections open in between
+keepalive = 30
+
+
+def post_worker_init(worker):
+    """Warms the caches of each freshly loaded worker."""
+    from app import find_active_task
+
+    # One search loads the competition list and the active task. It runs off
+    # the boot path, so a slow upstream cannot hold the worker past its
+    # timeout. force=True keeps it from counting as traffic, so the background
+    # refresh only starts with the first widget request.
+    threading.Thread(
+        target=find_active_task, kwargs={"force": True}, daemon=True
+    ).start()